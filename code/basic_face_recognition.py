@@ -1,48 +1,100 @@
 import numpy as np
 import cv2
 import os
+import time
 from pathlib import Path
 
 MIN_NEIGHBOURS = 5
+MIN_SIZE = 30
+LBPH_RADIUS = 1
+LBPH_NEIGHBOURS = 8
+# number of times the detection is timed when the latency is actually needed (see
+# multi_objective_fitness_function), the fastest run is reported as the latency
+LATENCY_REPEATS = 5
 
 
-def fr(scale_factor):
+def load_dataset():
+    '''
+    Read the dataset from disk, the images directory holds one image per known person (named after
+    the person) and input.jpg holds the image to be recognised. All images are decoded as grayscale.
+    Returns a dictionary with the known people's names, their images and the input image.
+    '''
+
+    # get current working directory using Path
+    current_working_directory = Path.cwd()
+    images_directory = os.path.join(
+        current_working_directory.parent, 'images')
+
+    # Create a list to store the known people's names (images to train the model on)
+    known_people = []
+    for file_name in os.listdir(images_directory):
+        person_name = os.path.splitext(file_name)[0]
+        known_people.append(person_name)
+
+    images = []
+    for person_name in known_people:
+        img_path = os.path.join(images_directory, f"{person_name}.jpg")
+        images.append(cv2.imread(img_path, cv2.IMREAD_GRAYSCALE))
+
+    # Load the input image
+    input_image_path = os.path.join(
+        current_working_directory.parent, 'input.jpg')
+    input_image = cv2.imread(input_image_path, cv2.IMREAD_GRAYSCALE)
+
+    return {'known_people': known_people, 'images': images, 'input_image': input_image}
+
+
+def fr(scale_factor, dataset=None):
     '''
     Main face recognition function, uses the images directory as the dataset, trains a model
     on the available images and assigns a label to the input image based on the trained model.
     The labels are obtained from the file names of the images available in the images folder itself.
 
     @param scale_factor: the scale factor to be used for the face detection algorithm
+    @param dataset: an already loaded dataset (see load_dataset), read from disk if not given
     '''
 
-    try:
-        # get current working directory using Path
-        current_working_directory = Path.cwd()
-        images_directory = os.path.join(
-            current_working_directory.parent, 'images')
+    person_name, confidence, latency = timed_fr(scale_factor, dataset=dataset)
+    return (person_name, confidence)
 
-        # Create a list to store the known people's names (images to train the model on)
-        known_people = []
-        for file_name in os.listdir(images_directory):
-            person_name = os.path.splitext(file_name)[0]
-            known_people.append(person_name)
+
+def timed_fr(scale_factor, min_neighbours=MIN_NEIGHBOURS, min_size=MIN_SIZE,
+             lbph_radius=LBPH_RADIUS, lbph_neighbours=LBPH_NEIGHBOURS, dataset=None, repeats=1):
+    '''
+    Same as fr, but every detector and LBPH parameter can be tuned and the time taken by
+    detectMultiScale on the input image is measured as well (as the fastest of several runs when
+    repeats is above one, since a single run of a few milliseconds is mostly noise).
+    Returns the prediction, its confidence and the detection latency in seconds.
+
+    @param scale_factor: the scale factor to be used for the face detection algorithm
+    @param min_neighbours: the number of neighbours each candidate rectangle needs to be retained
+    @param min_size: the minimum width and height (in pixels) of a detected face
+    @param lbph_radius: the radius of the circular local binary pattern
+    @param lbph_neighbours: the number of sample points of the circular local binary pattern
+    @param dataset: an already loaded dataset (see load_dataset), read from disk if not given.
+    Its images are never written to or copied, so they can be shared between processes
+    @param repeats: the number of times the detection is run and timed
+    '''
+
+    try:
+        if dataset is None:
+            dataset = load_dataset()
+        known_people = dataset['known_people']
 
         # Create LBPH recognizer, list to store data and labels
-        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer = cv2.face.LBPHFaceRecognizer_create(
+            radius=lbph_radius, neighbors=lbph_neighbours)
         training_data = []
         labels = []
 
         # Loop through known people
-        for person_name in known_people:
-
-            img_path = os.path.join(images_directory, f"{person_name}.jpg")
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+        for person_name, img in zip(known_people, dataset['images']):
 
             # Extract the face from the image
             face_cascade = cv2.CascadeClassifier(
                 cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
             faces = face_cascade.detectMultiScale(
-                img, scaleFactor=scale_factor, minNeighbors=MIN_NEIGHBOURS, minSize=(30, 30))
+                img, scaleFactor=scale_factor, minNeighbors=min_neighbours, minSize=(min_size, min_size))
 
             # add face to training data list and label to known labels
             for (x, y, w, h) in faces:
@@ -53,14 +105,15 @@ def fr(scale_factor):
         # Train the LBPH model with the training data and labels
         recognizer.train(training_data, np.array(labels))
 
-        # Load the input image
-        input_image_path = os.path.join(
-            current_working_directory.parent, 'input.jpg')
-        input_image = cv2.imread(input_image_path, cv2.IMREAD_GRAYSCALE)
+        input_image = dataset['input_image']
 
-        # Detect faces in the input image and loop through them
-        faces = face_cascade.detectMultiScale(
-            input_image, scaleFactor=scale_factor, minNeighbors=MIN_NEIGHBOURS, minSize=(30, 30))
+        # Detect faces in the input image (timing the detection) and loop through them
+        latency = float('inf')
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            faces = face_cascade.detectMultiScale(
+                input_image, scaleFactor=scale_factor, minNeighbors=min_neighbours, minSize=(min_size, min_size))
+            latency = min(latency, time.perf_counter() - start_time)
 
         for (x, y, w, h) in faces:
             face = input_image[y:y + h, x:x + w]
@@ -72,24 +125,12 @@ def fr(scale_factor):
             # Check if the predicted label is in the known people list
             if label < len(known_people):
                 person_name = known_people[label]
-                cv2.putText(input_image, f"{person_name}: {confidence:.2f}",
-                            (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-
-            # If the predicted label is not in the known people list, display 'Unidentified'
-            else:
-                cv2.putText(input_image, "Unidentified", (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-
-        # Display the input image with predicted labels
-        # cv2.imshow("Input Image", input_image)
-        # cv2.waitKey(0)
-        # cv2.destroyAllWindows()
 
         # print(
         #     f'Prediction: {person_name} with a confidence of: {confidence:.2f}%')
 
-        return (person_name, confidence)
+        return (person_name, confidence, latency)
 
     except Exception as e:
         # print('Error:', e)
-        return ('undefined', 0)
+        return ('undefined', 0, float('inf'))
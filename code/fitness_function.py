@@ -1,13 +1,30 @@
 
-from basic_face_recognition import fr
+from basic_face_recognition import fr, timed_fr, LATENCY_REPEATS
 
 
-def fitness_function(scale_factor):
+def fitness_function(scale_factor, dataset=None):
     '''
     Universal fitness function for all search algorithms.
     If there is a label mismatch, return zero.
     Otherwise, return the confidence value.
+    An already loaded dataset can be passed to avoid reading the images from disk on every call.
     '''
 
-    person_name, confidence = fr(scale_factor)
+    person_name, confidence = fr(scale_factor, dataset)
     return confidence, person_name
+
+
+def multi_objective_fitness_function(params, dataset=None):
+    '''
+    Fitness function for the multi-objective search algorithms.
+    Takes a vector of detector parameters (scale factor, min neighbours, min size,
+    LBPH radius, LBPH neighbours) and returns both the confidence (to be maximised)
+    and the detection latency in seconds (to be minimised, the fastest of LATENCY_REPEATS runs),
+    along with the prediction.
+    '''
+
+    scale_factor, min_neighbours, min_size, lbph_radius, lbph_neighbours = params
+    person_name, confidence, latency = timed_fr(
+        scale_factor, int(min_neighbours), int(min_size), int(lbph_radius), int(lbph_neighbours), dataset,
+        LATENCY_REPEATS)
+    return confidence, latency, person_name
@@ -0,0 +1,325 @@
+import os
+import json
+import hashlib
+import argparse
+from contextlib import contextmanager
+from multiprocessing import Pool
+from pathlib import Path
+import numpy as np
+import cv2
+from fitness_function import fitness_function
+from basic_face_recognition import MIN_NEIGHBOURS, MIN_SIZE, LBPH_RADIUS, LBPH_NEIGHBOURS
+from shared_dataset import publish_dataset, attach_dataset, release_dataset
+
+DEFAULT_LANDSCAPE_DIR = 'Fitness Landscape'
+LANDSCAPE_FILE = 'landscape.npy'
+METADATA_FILE = 'metadata.json'
+
+# the shared dataset every worker process attaches to in init_worker
+worker_dataset = None
+worker_blocks = None
+
+
+def dataset_hash():
+    '''
+    Hash the dataset used by the face recognition function (every file in the images directory
+    and the input image), so that a precomputed landscape can be checked against the current dataset.
+    '''
+
+    current_working_directory = Path.cwd()
+    images_directory = os.path.join(current_working_directory.parent, 'images')
+    paths = [os.path.join(images_directory, file_name)
+             for file_name in sorted(os.listdir(images_directory))]
+    paths.append(os.path.join(current_working_directory.parent, 'input.jpg'))
+
+    sha = hashlib.sha256()
+    for path in paths:
+        sha.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def recognition_settings():
+    '''
+    Everything besides the dataset that the fitness of a scale factor depends on, so that a
+    precomputed landscape can be checked against the current face recognition setup.
+    '''
+
+    return {
+        'min_neighbours': MIN_NEIGHBOURS,
+        'min_size': MIN_SIZE,
+        'lbph_radius': LBPH_RADIUS,
+        'lbph_neighbours': LBPH_NEIGHBOURS,
+        'opencv_version': cv2.__version__,
+    }
+
+
+def init_worker(description):
+    '''
+    Initializer for the worker processes, attaches to the shared dataset. Every core already
+    gets its own worker so OpenCV should not spawn threads of its own on top of that.
+
+    @param description: the description of the shared dataset returned by publish_dataset
+    '''
+
+    global worker_dataset, worker_blocks
+    cv2.setNumThreads(1)
+    worker_dataset, worker_blocks = attach_dataset(description)
+
+
+def evaluate_in_worker(scale_factor):
+    '''
+    Evaluate the fitness function in a worker process on the shared dataset.
+    '''
+
+    return fitness_function(scale_factor, worker_dataset)
+
+
+@contextmanager
+def worker_pool(num_workers=None):
+    '''
+    Decode the dataset once, publish it in shared memory and start a pool of worker processes
+    attached to it. The pool can be reused for any number of evaluate_scale_factors calls,
+    the workers are stopped and the shared memory is freed when the with block is left.
+
+    @param num_workers: the number of worker processes to be used (defaults to the number of cores)
+    '''
+
+    description, blocks = publish_dataset()
+    try:
+        with Pool(num_workers or os.cpu_count(), initializer=init_worker, initargs=(description,)) as pool:
+            yield pool
+    finally:
+        release_dataset(blocks, unlink=True)
+
+
+def evaluate_scale_factors(scale_factors, pool):
+    '''
+    Evaluate the fitness function for every scale factor in parallel.
+    Returns the list of confidences and the list of predictions.
+
+    @param scale_factors: the scale factors to be evaluated
+    @param pool: the pool of worker processes to be used, see worker_pool
+    '''
+
+    results = pool.map(evaluate_in_worker, [float(val)
+                       for val in scale_factors])
+    confidences = [val[0] for val in results]
+    predictions = [val[1] for val in results]
+    return confidences, predictions
+
+
+def save_landscape(scale_factors, confidences, predictions, landscape_dir=DEFAULT_LANDSCAPE_DIR):
+    '''
+    Store a landscape as a memory-mapped array of shape (2, number of points) holding the
+    scale factors and their confidences, with the predictions, the dataset hash and the
+    recognition settings as metadata.
+    Both files are written next to the old ones first and then swapped in, so that
+    landscapes which are already memory-mapped stay valid.
+
+    @param scale_factors: the scale factors of the landscape in increasing order
+    @param confidences: the confidence for every scale factor
+    @param predictions: the prediction for every scale factor
+    @param landscape_dir: the directory to store the landscape in
+    '''
+
+    os.makedirs(landscape_dir, exist_ok=True)
+    landscape_path = os.path.join(landscape_dir, LANDSCAPE_FILE)
+    metadata_path = os.path.join(landscape_dir, METADATA_FILE)
+
+    table = np.lib.format.open_memmap(
+        landscape_path + '.tmp', mode='w+', dtype=np.float64, shape=(2, len(scale_factors)))
+    table[0] = scale_factors
+    table[1] = confidences
+    table.flush()
+    del table
+
+    metadata = {
+        'dataset_hash': dataset_hash(),
+        'recognition_settings': recognition_settings(),
+        'num_points': len(scale_factors),
+        'lower': float(scale_factors[0]),
+        'upper': float(scale_factors[-1]),
+        'predictions': list(predictions),
+    }
+    with open(metadata_path + '.tmp', 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+    os.replace(landscape_path + '.tmp', landscape_path)
+    os.replace(metadata_path + '.tmp', metadata_path)
+
+
+def precompute_landscape(num_points, lower=1, upper=2, num_workers=None, landscape_dir=DEFAULT_LANDSCAPE_DIR, pool=None):
+    '''
+    Sweep an evenly spaced grid of scale factors in parallel and store the resulting fitness landscape.
+
+    @param num_points: the number of scale factors in the grid
+    @param lower: the smallest scale factor of the grid
+    @param upper: the largest scale factor of the grid
+    @param num_workers: the number of worker processes to be used (defaults to the number of cores)
+    @param landscape_dir: the directory to store the landscape in
+    @param pool: an already running pool of worker processes (see worker_pool), started here if not given
+    '''
+
+    # checked before the sweep, lookups need at least two scale factors in increasing order
+    if num_points < 2:
+        raise ValueError('The grid needs at least 2 scale factors')
+    if not lower < upper:
+        raise ValueError('The lower end of the grid must be smaller than the upper end')
+
+    if pool is None:
+        with worker_pool(num_workers) as pool:
+            return precompute_landscape(num_points, lower, upper, num_workers, landscape_dir, pool)
+
+    scale_factors = np.linspace(lower, upper, num_points)
+    confidences, predictions = evaluate_scale_factors(scale_factors, pool)
+    save_landscape(scale_factors, confidences, predictions, landscape_dir)
+    print(
+        f'Precomputed {num_points} scale factors between {lower} and {upper} into "{landscape_dir}"')
+
+
+def load_landscape(landscape_dir=DEFAULT_LANDSCAPE_DIR):
+    '''
+    Load a precomputed landscape as a read-only memory-mapped array of shape (2, number of points)
+    along with its predictions. Raises a ValueError if the dataset or the recognition settings
+    have changed since the landscape was computed, or if the table does not match its metadata.
+
+    @param landscape_dir: the directory the landscape is stored in
+    '''
+
+    with open(os.path.join(landscape_dir, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata['dataset_hash'] != dataset_hash():
+        raise ValueError(
+            f'The landscape in "{landscape_dir}" was computed on a different dataset, precompute it again')
+    if metadata.get('recognition_settings') != recognition_settings():
+        raise ValueError(
+            f'The landscape in "{landscape_dir}" was computed with different recognition settings, precompute it again')
+
+    table = np.load(os.path.join(landscape_dir, LANDSCAPE_FILE), mmap_mode='r')
+    # the table and the metadata are swapped in one after the other by save_landscape,
+    # so a table read in between may not belong to the metadata read above
+    if metadata['num_points'] != table.shape[1] or len(metadata['predictions']) != table.shape[1]:
+        raise ValueError(
+            f'The landscape in "{landscape_dir}" does not match its metadata, precompute it again')
+    return table, metadata['predictions']
+
+
+def refine_landscape(threshold, max_rounds=3, num_workers=None, landscape_dir=DEFAULT_LANDSCAPE_DIR, pool=None):
+    '''
+    Adaptively refine a precomputed landscape where it changes sharply: the midpoint of every pair
+    of neighbouring scale factors whose confidences differ by more than the threshold is evaluated
+    and added to the landscape, for at most max_rounds rounds.
+
+    @param threshold: the confidence difference above which an interval is refined
+    @param max_rounds: the maximum number of refinement rounds
+    @param num_workers: the number of worker processes to be used (defaults to the number of cores)
+    @param landscape_dir: the directory the landscape is stored in
+    @param pool: an already running pool of worker processes (see worker_pool), started here if not given
+    '''
+
+    if pool is None:
+        with worker_pool(num_workers) as pool:
+            return refine_landscape(threshold, max_rounds, num_workers, landscape_dir, pool)
+
+    table, predictions = load_landscape(landscape_dir)
+    scale_factors = np.array(table[0])
+    confidences = np.array(table[1])
+    predictions = list(predictions)
+    del table
+
+    for i in range(max_rounds):
+        sharp = np.nonzero(np.abs(np.diff(confidences)) > threshold)[0]
+        if len(sharp) == 0:
+            break
+        new_scale_factors = (scale_factors[sharp] + scale_factors[sharp + 1]) / 2
+        new_confidences, new_predictions = evaluate_scale_factors(
+            new_scale_factors, pool)
+        print(
+            f'Refinement round #{i + 1}: added {len(new_scale_factors)} scale factors')
+
+        # merge the new points into the landscape, keeping the scale factors sorted
+        scale_factors = np.concatenate([scale_factors, new_scale_factors])
+        confidences = np.concatenate([confidences, new_confidences])
+        predictions = predictions + new_predictions
+        order = np.argsort(scale_factors, kind='stable')
+        scale_factors = scale_factors[order]
+        confidences = confidences[order]
+        predictions = [predictions[j] for j in order]
+
+    save_landscape(scale_factors, confidences, predictions, landscape_dir)
+
+
+def table_fitness_function(landscape_dir=DEFAULT_LANDSCAPE_DIR, interpolate=True):
+    '''
+    Create a fitness function with the same signature as fitness_function which looks the
+    scale factor up in a precomputed landscape instead of running the face recognition,
+    so that any of the search algorithms can be run in table mode.
+    Scale factors outside of the landscape get a confidence of zero, like a failed recognition.
+
+    @param landscape_dir: the directory the landscape is stored in
+    @param interpolate: whether to linearly interpolate the confidence between neighbouring
+    scale factors, otherwise the nearest scale factor is used
+    '''
+
+    table, predictions = load_landscape(landscape_dir)
+    scale_factors, confidences = table[0], table[1]
+
+    def table_fitness(scale_factor):
+        if not scale_factors[0] <= scale_factor <= scale_factors[-1]:
+            return 0, 'undefined'
+
+        # index of the nearest scale factor in the landscape
+        right = min(int(np.searchsorted(scale_factors, scale_factor)),
+                    len(scale_factors) - 1)
+        left = max(right - 1, 0)
+        nearest = left if scale_factor - \
+            scale_factors[left] < scale_factors[right] - scale_factor else right
+
+        if interpolate and right != left:
+            weight = (scale_factor - scale_factors[left]) / \
+                (scale_factors[right] - scale_factors[left])
+            confidence = (1 - weight) * \
+                confidences[left] + weight * confidences[right]
+        else:
+            confidence = confidences[nearest]
+        return float(confidence), predictions[nearest]
+
+    return table_fitness
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Precompute the fitness landscape of the scale factor')
+    parser.add_argument('--points', type=int, default=101,
+                        help='number of scale factors in the grid')
+    parser.add_argument('--lower', type=float, default=1,
+                        help='smallest scale factor of the grid')
+    parser.add_argument('--upper', type=float, default=2,
+                        help='largest scale factor of the grid')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (defaults to the number of cores)')
+    parser.add_argument('--refine', type=float, default=None,
+                        help='refine intervals whose confidences differ by more than this')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='maximum number of refinement rounds')
+    parser.add_argument('--dir', default=DEFAULT_LANDSCAPE_DIR,
+                        help='directory to store the landscape in')
+    args = parser.parse_args()
+    if args.points < 2:
+        parser.error('--points must be at least 2')
+    if not args.lower < args.upper:
+        parser.error('--lower must be smaller than --upper')
+
+    # publish the dataset and start the workers once, for the sweep and every refinement round
+    with worker_pool(args.workers) as pool:
+        precompute_landscape(args.points, args.lower,
+                             args.upper, args.workers, args.dir, pool)
+        if args.refine is not None:
+            refine_landscape(args.refine, args.rounds,
+                             args.workers, args.dir, pool)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,14 @@
 import os
+import sys
 import random
 import datetime
 import matplotlib.pyplot as plt
-from fitness_function import fitness_function
+from fitness_function import fitness_function, multi_objective_fitness_function
+
+# (lower bound, upper bound, is integer) for every parameter searched by NSGA-II, in the order:
+# scale factor, min neighbours, min size, LBPH radius, LBPH neighbours
+NSGA_PARAM_BOUNDS = [(1, 2, False), (1, 10, True),
+                     (10, 100, True), (1, 4, True), (4, 12, True)]
 
 
 def genetic_algorithm(population_size, fitness_func, num_generations, mutation_rate, mode):
@@ -96,6 +102,245 @@ def genetic_algorithm(population_size, fitness_func, num_generations, mutation_r
     return fittest_param, fittest_fitness, best_prediction
 
 
+def random_individual():
+    '''
+    Create a random parameter vector within the bounds given by NSGA_PARAM_BOUNDS.
+    '''
+
+    return [random.randint(low, high) if is_int else random.uniform(low, high)
+            for low, high, is_int in NSGA_PARAM_BOUNDS]
+
+
+def failed(objectives):
+    '''
+    Check whether the objectives (confidence, latency) belong to a failed evaluation,
+    the face recognition reports those with an infinite latency.
+    '''
+
+    return objectives[1] == float('inf')
+
+
+def dominates(a, b):
+    '''
+    Check whether the objectives a = (confidence, latency) Pareto-dominate the objectives b,
+    i.e. a is at least as confident and at least as fast as b, and strictly better in one of them.
+    Every successful evaluation dominates every failed one (confidences can be negative, so a
+    failure's confidence of zero alone would not do that), and failures dominate nothing.
+    '''
+
+    if failed(a):
+        return False
+    if failed(b):
+        return True
+    return a[0] >= b[0] and a[1] <= b[1] and (a[0] > b[0] or a[1] < b[1])
+
+
+def non_dominated_sort(objectives):
+    '''
+    Sort the individuals into Pareto fronts, the first front contains the individuals
+    not dominated by anyone, the second one those only dominated by the first front and so on.
+    Returns a list of fronts, each front being a list of indices into objectives.
+    '''
+
+    dominated_by = [[] for _ in objectives]
+    domination_count = [0 for _ in objectives]
+    fronts = [[]]
+
+    for i in range(len(objectives)):
+        for j in range(len(objectives)):
+            if dominates(objectives[i], objectives[j]):
+                dominated_by[i].append(j)
+            elif dominates(objectives[j], objectives[i]):
+                domination_count[i] += 1
+        if domination_count[i] == 0:
+            fronts[0].append(i)
+
+    while fronts[-1]:
+        next_front = []
+        for i in fronts[-1]:
+            for j in dominated_by[i]:
+                domination_count[j] -= 1
+                if domination_count[j] == 0:
+                    next_front.append(j)
+        fronts.append(next_front)
+
+    return fronts[:-1]
+
+
+def crowding_distance(front, objectives):
+    '''
+    Compute the crowding distance of every individual of a front, individuals in sparse regions
+    of the front get a larger distance so that the front stays spread out.
+    Returns a dictionary mapping indices to distances.
+    '''
+
+    distances = {i: 0.0 for i in front}
+    # failed evaluations keep a distance of zero, so they are the first to be cut from a front
+    succeeded = [i for i in front if not failed(objectives[i])]
+    for m in range(2):
+        ordered = sorted(succeeded, key=lambda i: objectives[i][m])
+        if not ordered:
+            continue
+        distances[ordered[0]] = distances[ordered[-1]] = float('inf')
+        value_range = objectives[ordered[-1]][m] - objectives[ordered[0]][m]
+        if value_range == 0:
+            continue
+        for k in range(1, len(ordered) - 1):
+            distances[ordered[k]] += (objectives[ordered[k + 1]][m] -
+                                      objectives[ordered[k - 1]][m]) / value_range
+
+    return distances
+
+
+def nsga2(population_size, fitness_func, num_generations, mutation_rate, mode):
+    '''
+    Implementation of NSGA-II, a multi-objective variant of the genetic algorithm above, to tune
+    a vector of detector parameters (see NSGA_PARAM_BOUNDS) for both a high recognition confidence
+    and a low face detection latency. Since these two objectives conflict, the whole Pareto front
+    of the final population is returned instead of a single fittest individual.
+
+    @param population_size: the number of individuals in the population
+    @param fitness_func: the fitness function returning (confidence, latency, prediction) for a parameter vector
+    @param num_generations: the number of generations to evolve the population
+    @param mutation_rate: the probability of mutation of an offspring
+    @param mode: the mode of the algorithm to be used (1: show plot after every generation
+    2: save a plot showing the latency vs confidence of each individual in every generation)
+    '''
+
+    # create an initial population of random parameter vectors
+    population = [random_individual() for _ in range(population_size)]
+    results = [fitness_func(params) for params in population]
+    print(f'Initial population: {population}')
+    print(f'Initial objectives: {[val[:2] for val in results]}\n')
+    print('-' * 180, '\n')
+
+    now = datetime.datetime.now()
+    # Format the date and time as "DD-MM-YYYY at HH:MM"
+    formatted_datetime = now.strftime("%d-%m-%Y at %H-%M-%S")
+
+    if (mode == 2):
+        # create a directory for saving the plots
+        plots_dir = f'NSGA-II Plots [{formatted_datetime}]'
+        os.makedirs(plots_dir, exist_ok=True)
+
+    # start a figure of its own, so that nothing drawn before (e.g. by genetic_algorithm) shows up in it
+    plt.figure()
+    max_latency = 0
+
+    for generation_number in range(num_generations):
+        print(f'Generation #{generation_number + 1}:\n')
+
+        # rank the current population so that parents can be picked by tournament
+        objectives = [val[:2] for val in results]
+        rank = {}
+        distances = {}
+        for front_number, front in enumerate(non_dominated_sort(objectives)):
+            distances.update(crowding_distance(front, objectives))
+            for i in front:
+                rank[i] = front_number
+
+        def tournament():
+            # binary tournament, lower rank wins and ties are broken by the larger crowding distance
+            i, j = random.randrange(population_size), random.randrange(population_size)
+            if (rank[i], -distances[i]) <= (rank[j], -distances[j]):
+                return population[i]
+            return population[j]
+
+        # create the offspring by mating the tournament winners
+        offspring = []
+        for _ in range(population_size):
+            parent1 = tournament()
+            parent2 = tournament()
+            child = []
+            for gene1, gene2, (low, high, is_int) in zip(parent1, parent2, NSGA_PARAM_BOUNDS):
+                gene = (gene1 + gene2) / 2.0
+                child.append(int(round(gene)) if is_int else gene)
+
+            # mutation, re-sample one randomly chosen parameter
+            if mutation_rate > random.randint(0, 100) / 100:
+                k = random.randrange(len(NSGA_PARAM_BOUNDS))
+                child[k] = random_individual()[k]
+
+            offspring.append(child)
+
+        offspring_results = [fitness_func(params) for params in offspring]
+
+        # select the next generation from parents and offspring together, front by front,
+        # using the crowding distance to cut the last front that does not fit completely
+        combined = population + offspring
+        combined_results = results + offspring_results
+        combined_objectives = [val[:2] for val in combined_results]
+        survivors = []
+        for front in non_dominated_sort(combined_objectives):
+            if len(survivors) + len(front) <= population_size:
+                survivors.extend(front)
+                continue
+            front_distances = crowding_distance(front, combined_objectives)
+            front = sorted(front, key=lambda i: front_distances[i], reverse=True)
+            survivors.extend(front[:population_size - len(survivors)])
+            break
+
+        population = [combined[i] for i in survivors]
+        results = [combined_results[i] for i in survivors]
+        print(f'Population:', population)
+        print(f'Objectives:', [val[:2] for val in results], '\n')
+        print('-' * 180, '\n')
+
+        # plot latency vs confidence for each individual in the current generation
+        plotted = [val for val in results if val[1] != float('inf')]
+        plt.scatter([val[1] for val in plotted], [val[0] for val in plotted])
+        plt.xlabel('Detection Latency (s)')
+        plt.ylabel('Confidence')
+        plt.title(
+            f'Latency vs Confidence till generation {generation_number + 1}')
+        # set x axis limits from the latencies plotted so far
+        max_latency = max([max_latency] + [val[1] for val in plotted])
+        if max_latency > 0:
+            plt.xlim(0, max_latency * 1.1)
+        plt.ylim(0, 100)  # Set y axis limits from 0 to 100
+        if mode == 2:
+            # save plot as an image
+            plt.savefig(
+                f'{plots_dir}/Plot till generation {generation_number + 1}.png')
+            plt.title('Cumulative Plot')
+            plt.savefig(f'{plots_dir}/Cumulative.png')
+        else:
+            plt.show()
+
+    # the latencies of the survivors were measured only once, possibly many generations ago,
+    # so measure the final population again before picking the Pareto front
+    results = [fitness_func(params) for params in population]
+
+    # return the Pareto front of the final population, fastest configuration first,
+    # leaving out failed evaluations (they only make up the front if nothing succeeded)
+    objectives = [val[:2] for val in results]
+    pareto_front = []
+    for i in non_dominated_sort(objectives)[0]:
+        confidence, latency, prediction = results[i]
+        if failed((confidence, latency)):
+            continue
+        if population[i] not in [val[0] for val in pareto_front]:
+            pareto_front.append(
+                (population[i], confidence, latency, prediction))
+    pareto_front.sort(key=lambda val: val[2])
+    return pareto_front
+
+
+def fastest_good_enough(pareto_front, min_confidence):
+    '''
+    Pick the fastest configuration from a Pareto front returned by nsga2 whose confidence
+    is at least min_confidence, returns None if no configuration is confident enough.
+
+    @param pareto_front: the Pareto front returned by nsga2
+    @param min_confidence: the minimum acceptable confidence
+    '''
+
+    good_enough = [val for val in pareto_front if val[1] >= min_confidence]
+    if not good_enough:
+        return None
+    return min(good_enough, key=lambda val: val[2])
+
+
 def main():
     param, fitness, prediction = genetic_algorithm(
         4, fitness_function, 10, 0.5, 2)
@@ -104,5 +349,16 @@ def main():
     print("Prediction: ", prediction)
 
 
+def nsga2_main():
+    pareto_front = nsga2(4, multi_objective_fitness_function, 10, 0.5, 2)
+    for params, confidence, latency, prediction in pareto_front:
+        print(
+            f"Parameters: {params}, confidence: {confidence:.4f}, latency: {latency:.4f}s, prediction: {prediction}")
+
+
 if __name__ == '__main__':
-    main()
+    # run NSGA-II with "python genetic_algorithm.py nsga2", the plain genetic algorithm otherwise
+    if sys.argv[1:] == ['nsga2']:
+        nsga2_main()
+    else:
+        main()
@@ -3,8 +3,8 @@ from tkinter import simpledialog
 from hill_climb import hill_climbing
 from particle_swarm_optimisation import particle_swarm_optimization
 from simulated_annealing import simulated_annealing
-from genetic_algorithm import genetic_algorithm
-from fitness_function import fitness_function
+from genetic_algorithm import genetic_algorithm, nsga2, fastest_good_enough
+from fitness_function import fitness_function, multi_objective_fitness_function
 
 
 def on_pso_click():
@@ -32,6 +32,28 @@ def on_ga_click():
         text=f"Scale Factor, confidence and label is : {scaleFactor, confidence, label}")
 
 
+def on_nsga2_click():
+    population_size = simpledialog.askinteger(
+        "Population Size", f"Enter Population size")
+    num_generations = simpledialog.askinteger(
+        "Number of generations", f"Enter number of generations")
+    mutation_rate = simpledialog.askfloat(
+        "Mutation rate", f"Enter Mutation rate")
+    mode = simpledialog.askinteger("Mode", f"Enter Mode (either 1 or 2)")
+    min_confidence = simpledialog.askfloat(
+        "Minimum confidence", f"Enter minimum acceptable confidence")
+    pareto_front = nsga2(population_size, multi_objective_fitness_function,
+                         num_generations, mutation_rate, mode)
+    best = fastest_good_enough(pareto_front, min_confidence)
+    if best is None:
+        result_label.config(
+            text=f"No configuration on the Pareto front ({len(pareto_front)} points) reaches confidence {min_confidence}")
+    else:
+        params, confidence, latency, label = best
+        result_label.config(
+            text=f"Fastest parameters, confidence, latency and label is : {params, confidence, latency, label}")
+
+
 def on_hill_climbing_click():
     step_size = simpledialog.askfloat(
         "Step size", f"Enter step size")
@@ -83,12 +105,15 @@ simulated_annealing_button = tk.Button(
     frame, text="Simulated Annealing", command=on_simulated_annealing_click)
 simulated_annealing_button.grid(row=1, column=2, padx=5, pady=5)
 
+nsga2_button = tk.Button(frame, text="NSGA-II", command=on_nsga2_click)
+nsga2_button.grid(row=2, column=1, padx=5, pady=5)
+
 quit_button = tk.Button(
     frame, text="Close", command=on_close)
-quit_button.grid(row=2, column=1, padx=5, pady=5)
+quit_button.grid(row=3, column=1, padx=5, pady=5)
 
 result_label = tk.Label(frame, text="")
-result_label.grid(row=3, column=0, columnspan=2, pady=10)
+result_label.grid(row=4, column=0, columnspan=2, pady=10)
 
 frame.tkraise()
 root.mainloop()
@@ -0,0 +1,104 @@
+from multiprocessing import shared_memory
+import numpy as np
+from basic_face_recognition import load_dataset
+
+
+def publish_dataset(dataset=None):
+    '''
+    Publish the decoded grayscale images of a dataset (see load_dataset) into shared memory blocks,
+    one block per image, so that worker processes can attach to them instead of reading and
+    decoding the images again or receiving pickled copies of them.
+    Returns a small picklable description of the blocks to be handed to the workers, and the
+    blocks themselves, which the publishing process has to keep alive until the workers are done
+    and then release with release_dataset(blocks, unlink=True).
+
+    @param dataset: the dataset to be published, read from disk if not given.
+    Raises a ValueError if one of its images could not be decoded
+    '''
+
+    if dataset is None:
+        dataset = load_dataset()
+
+    images = list(dataset['images']) + [dataset['input_image']]
+    names = [f'images/{person_name}.jpg' for person_name in dataset['known_people']] + \
+        ['input.jpg']
+    # an image OpenCV could not decode is read as None, which cannot be published
+    for name, image in zip(names, images):
+        if image is None:
+            raise ValueError(f'Could not decode {name}')
+
+    blocks = []
+    arrays = []
+    try:
+        for image in images:
+            image = np.ascontiguousarray(image)
+            block = shared_memory.SharedMemory(
+                create=True, size=max(image.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(image.shape, dtype=image.dtype,
+                       buffer=block.buf)[...] = image
+            arrays.append((block.name, image.shape, image.dtype.str))
+    except BaseException:
+        # free the blocks created so far, nobody else knows about them yet
+        release_dataset(blocks, unlink=True)
+        raise
+
+    description = {
+        'known_people': list(dataset['known_people']),
+        'images': arrays[:-1],
+        'input_image': arrays[-1],
+    }
+    return description, blocks
+
+
+def attach_block(name):
+    '''
+    Attach to an existing shared memory block without registering it with the resource tracker
+    (where supported), since only the publishing process is responsible for unlinking it.
+    '''
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # the track argument was only added in Python 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach_dataset(description):
+    '''
+    Attach to a dataset published with publish_dataset. The images are NumPy views directly on
+    the shared memory, nothing is copied, so they must not be written to.
+    Returns the dataset, usable wherever load_dataset's result is, and the attached blocks,
+    which have to be kept alive for as long as the dataset is in use.
+
+    @param description: the description returned by publish_dataset
+    '''
+
+    blocks = []
+
+    def view(array):
+        name, shape, dtype = array
+        block = attach_block(name)
+        blocks.append(block)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    dataset = {
+        'known_people': description['known_people'],
+        'images': [view(array) for array in description['images']],
+        'input_image': view(description['input_image']),
+    }
+    return dataset, blocks
+
+
+def release_dataset(blocks, unlink=False):
+    '''
+    Close the shared memory blocks of a dataset, every view on them has to be deleted first.
+
+    @param blocks: the blocks returned by publish_dataset or attach_dataset
+    @param unlink: whether to also free the blocks, only the publishing process should do this
+    '''
+
+    for block in blocks:
+        block.close()
+        if unlink:
+            block.unlink()